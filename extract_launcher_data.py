@@ -1,6 +1,40 @@
 import sqlite3
 import re
 import os
+from contextlib import closing
+
+# 在模块级编译一次，而不是每次调用函数时重新编译。
+# 匹配 "component=" 后面，"/" 前面的部分
+# ([^/]+) 是一个捕获组，匹配一个或多个非斜杠字符
+_COMPONENT_RE = re.compile(r'component=([^/]+)/')
+
+def _extract_package(intent_str):
+    """
+    从 intent 字符串中提取包名。
+    快路径用两次 str.partition（C级子串查找）代替正则匹配；
+    结果异常（为空或混入';'）时才回退到正则。
+    """
+    _head, sep, tail = intent_str.partition('component=')
+    if sep:
+        package_name = tail.partition('/')[0]
+        if package_name and ';' not in package_name:
+            return package_name
+    match = _COMPONENT_RE.search(intent_str)
+    return match.group(1) if match else None
+
+def _open_db(db_file):
+    """
+    打开SQLite连接并应用性能相关的PRAGMA：
+    WAL日志模式让读写互不阻塞，synchronous=NORMAL省去每次提交的多余fsync，
+    temp_store=MEMORY把临时数据放进内存。
+    """
+    conn = sqlite3.connect(db_file)
+    conn.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA temp_store=MEMORY;"
+    )
+    return conn
 
 def create_dummy_db(db_file):
     """
@@ -20,10 +54,10 @@ def create_dummy_db(db_file):
     ]
 
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        # 创建一个与问题描述类似的表
-        cursor.execute('''
+        # closing保证离开with块时连接一定被关闭
+        with closing(_open_db(db_file)) as conn:
+            # 创建一个与问题描述类似的表
+            conn.execute('''
         CREATE TABLE IF NOT EXISTS favorites (
             _id INTEGER PRIMARY KEY,
             title TEXT,
@@ -53,14 +87,11 @@ def create_dummy_db(db_file):
             product_id TEXT
         )
         ''')
-        # 插入数据
-        cursor.executemany('INSERT INTO favorites VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)', data)
-        conn.commit()
+            # 插入数据：放在单个事务里批量提交，只付一次提交开销
+            with conn:
+                conn.executemany('INSERT INTO favorites VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)', data)
     except sqlite3.Error as e:
         print(f"创建数据库时出错: {e}")
-    finally:
-        if conn:
-            conn.close()
 
 
 def extract_package_info(db_file):
@@ -73,45 +104,30 @@ def extract_package_info(db_file):
 
     results = []
     try:
-        # 连接到 SQLite 数据库
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-
-        # 执行查询，选择 title 和 intent 字段
-        cursor.execute("SELECT title, intent FROM favorites")
-        rows = cursor.fetchall()
-
-        # 编译正则表达式以提高效率
-        # 匹配 "component=" 后面，"/" 前面的部分
-        # ([^/]+) 是一个捕获组，匹配一个或多个非斜杠字符
-        pattern = re.compile(r'component=([^/]+)/')
+        # 连接到 SQLite 数据库；closing保证离开with块时连接一定被关闭
+        with closing(_open_db(db_file)) as conn:
+            # 执行查询，选择 title 和 intent 字段
+            rows = conn.execute("SELECT title, intent FROM favorites").fetchall()
 
         print("\n提取结果:")
         print("-" * 20)
-        
+
         for row in rows:
             app_name, intent_str = row
 
             # 过滤 intent 为空的行
             if not intent_str:
                 continue
-            
-            # 在 intent 字符串中搜索匹配项
-            match = pattern.search(intent_str)
-            
-            if match:
-                # 提取第一个捕获组，即包名
-                package_name = match.group(1)
+
+            # 提取包名（partition快路径 + 正则兜底）
+            package_name = _extract_package(intent_str)
+
+            if package_name:
                 # 打印结果
                 print(f"{package_name},{app_name}")
 
-
     except sqlite3.Error as e:
         print(f"数据库操作失败: {e}")
-    finally:
-        # 关闭数据库连接
-        if 'conn' in locals() and conn:
-            conn.close()
 
 
 if __name__ == "__main__":
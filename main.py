@@ -2,24 +2,90 @@
 
 import os
 import json
+import time
+import asyncio
+import hashlib
+from contextlib import closing
+from dataclasses import dataclass
 import numpy as np
+import httpx
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
 from sklearn.cluster import DBSCAN
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 import sqlite3
 import re
 
+# orjson 的编解码比标准库快3-5倍且直接产出bytes；未安装时退回标准库json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# faiss 用BLAS矩阵乘+SIMD计算相似度，比sklearn的逐对距离路径快得多；
+# 未安装时退回sklearn的DBSCAN
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
 # 新增：定义缓存文件的路径
 CACHE_FILE = "app_tags_cache.json"
+# 新增：增量缓存日志（JSON Lines 格式）。新条目先追加到这里，
+# 程序正常退出时再整合回 CACHE_FILE。
+CACHE_JOURNAL_FILE = "app_tags_cache.jsonl"
+# 新增：随仓库分发的常见应用标签表。命中的包名无需请求LLM。
+KNOWN_TAGS_DB = "known_tags.sqlite"
+
+# 新增：在模块级编译一次，而不是每次调用函数时重新编译。
+# 匹配 "component=" 后面，"/" 前面的部分。
+# 字符类额外排除 \x1f（单元分隔符），这样对多条intent拼接成的大字符串
+# 做一次扫描时，匹配不会跨越行边界。
+_COMPONENT_RE = re.compile(r'component=([^/\x1f]+)/')
+
+def _open_db(db_file: str) -> sqlite3.Connection:
+    """
+    打开SQLite连接并应用性能相关的PRAGMA：
+    WAL日志模式让读写互不阻塞，synchronous=NORMAL省去每次提交的多余fsync，
+    temp_store=MEMORY与更大的page cache减少磁盘访问。
+    """
+    conn = sqlite3.connect(db_file)
+    conn.executescript(
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA temp_store=MEMORY;"
+        "PRAGMA cache_size=-20000;"
+    )
+    return conn
+
+# 新增：并发调用Gemini的参数。打标签是纯网络I/O，串行执行时总耗时约为 N * 单次往返延迟，
+# 并发后可降到约 (N / 并发数) * 单次往返延迟。
+MAX_CONCURRENT_REQUESTS = 12  # 同时在途的API请求上限
+REQUEST_TIMEOUT_SECONDS = 60  # 单次请求的超时时间
+MAX_RETRIES = 3               # 失败后的最大重试次数（指数退避）
+EMBED_BATCH_SIZE = 100        # 单次Embedding请求最多提交的标签条数
+EMBEDDING_DIM = 768           # text-embedding-004 的向量维度
+COSINE_EPS = 0.4              # 聚类的余弦距离阈值（归一化后换算成欧氏距离使用）
+
+@dataclass(slots=True)
+class App:
+    """
+    一条应用记录。用slots代替每行一个字典，省去__dict__和逐键哈希的开销。
+    tags 在标签阶段完成后回填。
+    """
+    name: str
+    package: str
+    tags: str = ""
 
-def extract_apps_from_db(db_file: str) -> list[dict]:
+def extract_apps_from_db(db_file: str) -> list[App]:
     """
     从指定的数据库文件中提取应用名和包名。
     如果数据库文件不存在，则直接引发 FileNotFoundError。
 
     :param db_file: SQLite 数据库文件的路径。
-    :return: 一个包含应用信息的字典列表，例如 [{'name': '微信', 'package': 'com.tencent.mm'}]。
+    :return: 一个App记录列表，例如 [App(name='微信', package='com.tencent.mm')]。
     :raises FileNotFoundError: 如果 db_file 不存在。
     :raises sqlite3.Error: 如果发生数据库相关错误。
     """
@@ -27,74 +93,237 @@ def extract_apps_from_db(db_file: str) -> list[dict]:
         raise FileNotFoundError(f"错误: 数据库文件 '{db_file}' 不存在。")
 
     apps = []
-    conn = None # 预先定义conn，确保finally块中可用
     try:
-        # 连接到 SQLite 数据库
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-
-        # 执行查询，选择 title 和 intent 字段
-        cursor.execute("SELECT title, intent FROM favorites")
-        rows = cursor.fetchall()
-
-        # 编译正则表达式以提高效率
-        # 匹配 "component=" 后面，"/" 前面的部分
-        pattern = re.compile(r'component=([^/]+)/')
-
-        for row in rows:
-            app_name, intent_str = row
-
-            # 过滤 intent 为空的行或不含 component 的行
-            if not intent_str or 'component=' not in intent_str:
-                continue
-            
-            # 在 intent 字符串中搜索匹配项
-            match = pattern.search(intent_str)
-            
-            if match:
-                # 提取第一个捕获组，即包名
-                package_name = match.group(1)
-                apps.append({'name': app_name, 'package': package_name})
-        
+        # 连接到 SQLite 数据库；closing保证离开with块时连接一定被关闭
+        with closing(_open_db(db_file)) as conn:
+            # 执行查询，选择 title 和 intent 字段。
+            # 把"intent 非空且包含 component="的过滤下推到SQL层，减少进入Python的行数。
+            cursor = conn.execute(
+                "SELECT title, intent FROM favorites "
+                "WHERE intent IS NOT NULL AND intent LIKE '%component=%'"
+            )
+
+            # fetchall() 一次性物化所有行：后面的单遍扫描需要完整结果集，
+            # 而且这样连接在扫描开始前就能关闭。
+            rows = cursor.fetchall()
+        if rows:
+            titles = [row[0] for row in rows]
+            intents = [row[1] for row in rows]
+            blob = '\x1f'.join(intents)
+
+            # starts[i] 记录第 i 条 intent 在 blob 中的起始偏移
+            starts = []
+            offset = 0
+            for intent_str in intents:
+                starts.append(offset)
+                offset += len(intent_str) + 1
+
+            # finditer 按偏移递增产出匹配，单调推进行指针即可定位所属行
+            row_index = 0
+            last_matched_row = -1
+            for match in _COMPONENT_RE.finditer(blob):
+                while row_index + 1 < len(starts) and starts[row_index + 1] <= match.start():
+                    row_index += 1
+                # 同一条intent只取第一个匹配，与原先 pattern.search 的语义一致
+                if row_index == last_matched_row:
+                    continue
+                last_matched_row = row_index
+                apps.append(App(titles[row_index], match.group(1)))
+
         print(f"成功从 '{db_file}' 中提取了 {len(apps)} 个应用信息。")
         return apps
 
     except sqlite3.Error as e:
         # 将底层数据库异常继续向上抛出，由调用者处理
         raise sqlite3.Error(f"数据库操作失败: {e}") from e
-    finally:
-        # 关闭数据库连接
-        if conn:
-            conn.close()
 
 
-def load_cache() -> dict:
+def _json_loads(data: bytes) -> dict:
+    """
+    反序列化缓存内容，优先使用orjson。
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _json_dumps(obj, indent: bool = False) -> bytes:
+    """
+    把缓存对象序列化为UTF-8字节串，优先使用orjson。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def _tags_sha256(tags: str) -> str:
+    """
+    计算标签字符串的SHA-256摘要，用于判断缓存中的向量是否仍然有效。
+    """
+    return hashlib.sha256(tags.encode('utf-8')).hexdigest()
+
+def _make_cache_entry(tags: str, embedding: list[float] | None = None) -> dict:
+    """
+    构造一条缓存记录。embedding 在向量阶段完成后回填。
+    """
+    return {'tags': tags, 'tags_sha256': _tags_sha256(tags), 'embedding': embedding}
+
+def cluster_vectors(vec_mat: np.ndarray, min_samples: int = 2) -> np.ndarray:
     """
-    加载本地缓存文件。如果文件不存在或为空，返回空字典。
+    对已归一化到单位长度的向量做DBSCAN聚类，返回每行的簇编号（-1为离群点）。
+    安装了faiss时，用 IndexFlatIP.range_search 一次性算出所有点的eps邻域
+    （单位向量的内积即余弦相似度），再按DBSCAN语义还原簇：
+    核心点之间的连通分量构成簇骨架，边界点归入相邻核心点的簇。
+    未安装faiss时退回sklearn的DBSCAN（欧氏距离 + ball_tree索引）。
     """
-    if not os.path.exists(CACHE_FILE):
+    if faiss is None:
+        # 归一化后余弦距离与欧氏距离单调对应：eps_l2 = sqrt(2 * eps_cos)
+        eps_l2 = float(np.sqrt(2 * COSINE_EPS))
+        print(f"使用DBSCAN算法进行聚类 (eps_cos={COSINE_EPS} -> eps_l2={eps_l2:.3f}, min_samples={min_samples}, metric='euclidean')...")
+        dbscan = DBSCAN(eps=eps_l2, min_samples=min_samples, metric='euclidean', algorithm='ball_tree', n_jobs=-1)
+        return dbscan.fit_predict(vec_mat)
+
+    print(f"使用FAISS range_search + 连通分量进行聚类 (eps_cos={COSINE_EPS}, min_samples={min_samples})...")
+    n = vec_mat.shape[0]
+    index = faiss.IndexFlatIP(vec_mat.shape[1])
+    index.add(vec_mat)
+    # 邻域条件：余弦相似度 >= 1 - eps_cos
+    lims, _dists, neighbors = index.range_search(vec_mat, 1.0 - COSINE_EPS)
+    lims = np.asarray(lims)
+    neighbors = np.asarray(neighbors)
+
+    # 核心点：eps邻域内（含自身）至少有 min_samples 个点
+    counts = np.diff(lims)
+    core = counts >= min_samples
+
+    # 只保留核心点-核心点之间的边，求连通分量得到簇骨架
+    sources = np.repeat(np.arange(n), counts)
+    edge_mask = core[sources] & core[neighbors]
+    graph = csr_matrix(
+        (np.ones(int(edge_mask.sum()), dtype=np.int8),
+         (sources[edge_mask], neighbors[edge_mask])),
+        shape=(n, n)
+    )
+    _num_components, components = connected_components(graph, directed=False)
+
+    # 把核心点的分量编号重排成从0开始的连续簇号
+    labels = np.full(n, -1, dtype=np.int64)
+    label_by_component = {}
+    for i in np.flatnonzero(core):
+        component = components[i]
+        if component not in label_by_component:
+            label_by_component[component] = len(label_by_component)
+        labels[i] = label_by_component[component]
+
+    # 边界点：自身不是核心点，但eps邻域里有核心点，归入该核心点的簇
+    for i in np.flatnonzero(~core):
+        neighborhood = neighbors[lims[i]:lims[i + 1]]
+        core_neighbors = neighborhood[core[neighborhood]]
+        if core_neighbors.size:
+            labels[i] = labels[core_neighbors[0]]
+
+    return labels
+
+def load_known_tags() -> dict:
+    """
+    加载随仓库分发的常见应用标签表（package -> tags）。
+    大多数启动器数据库里的应用都是常见的系统/热门应用，先查本地表
+    可以免去这些包的LLM调用。文件不存在时返回空字典。
+    注意这里用原生 sqlite3.connect 打开：该表是只读分发文件，
+    不应该被 _open_db 的 journal_mode=WAL 修改文件头。
+    """
+    if not os.path.exists(KNOWN_TAGS_DB):
         return {}
     try:
-        with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-            # 修正点: 增加对空文件的判断，避免json.load抛出异常
-            content = f.read()
-            if not content:
-                return {}
-            return json.loads(content)
-    except (IOError, json.JSONDecodeError) as e:
-        print(f"警告：读取缓存文件 '{CACHE_FILE}' 失败: {e}。将使用一个空的缓存开始。")
+        with closing(sqlite3.connect(KNOWN_TAGS_DB)) as conn:
+            known = dict(conn.execute("SELECT package, tags FROM tags"))
+        print(f"已从 '{KNOWN_TAGS_DB}' 加载 {len(known)} 条常见应用标签。")
+        return known
+    except sqlite3.Error as e:
+        print(f"警告：读取常见应用标签表 '{KNOWN_TAGS_DB}' 失败: {e}。")
         return {}
 
-def save_cache(cache_data: dict):
+def load_cache() -> dict:
+    """
+    加载本地缓存。先读取整合后的JSON文件，再把增量日志(JSONL)逐行回放到其上，
+    保证上次运行中途退出时已追加的条目不会丢失。
+    缓存按包名索引，每条记录为 {'tags': ..., 'tags_sha256': ..., 'embedding': ...}。
+    """
+    cache = {}
+    if os.path.exists(CACHE_FILE):
+        try:
+            with open(CACHE_FILE, 'rb') as f:
+                # 修正点: 增加对空文件的判断，避免反序列化抛出异常
+                content = f.read()
+                if content:
+                    cache = _json_loads(content)
+        except (IOError, ValueError) as e:
+            print(f"警告：读取缓存文件 '{CACHE_FILE}' 失败: {e}。将使用一个空的缓存开始。")
+            cache = {}
+
+    # 回放增量日志，新条目覆盖旧值
+    if os.path.exists(CACHE_JOURNAL_FILE):
+        try:
+            with open(CACHE_JOURNAL_FILE, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = _json_loads(line)
+                        package = record.pop('package')
+                        cache[package] = {
+                            'tags': record['tags'],
+                            'tags_sha256': record['tags_sha256'],
+                            'embedding': record.get('embedding'),
+                        }
+                    except (ValueError, KeyError):
+                        # 某一行可能因程序中途退出而写了一半，跳过即可
+                        continue
+        except IOError as e:
+            print(f"警告：读取缓存日志 '{CACHE_JOURNAL_FILE}' 失败: {e}。")
+
+    # 兼容旧版缓存：旧格式的值是纯标签字符串，就地升级为新结构
+    for package, value in list(cache.items()):
+        if isinstance(value, str):
+            cache[package] = _make_cache_entry(value)
+
+    return cache
+
+def save_cache(package_name: str, entry: dict):
+    """
+    将单条缓存记录以追加方式写入缓存日志。
+    相比每次全量重写JSON文件（N次未命中累计写入O(N²)字节），追加一行只需O(1)。
+    """
+    try:
+        with open(CACHE_JOURNAL_FILE, 'ab') as f:
+            f.write(_json_dumps({'package': package_name, **entry}) + b'\n')
+    except IOError as e:
+        print(f"错误：无法写入缓存日志 '{CACHE_JOURNAL_FILE}': {e}")
+
+def compact_cache(cache_data: dict):
     """
-    将缓存数据保存到JSON文件。
+    程序退出前调用：把内存中的完整缓存整合回JSON文件，并删除增量日志。
+    先写入临时文件并fsync，再用 os.replace 原子替换目标文件——
+    中途崩溃或并发读取都不会看到写了一半的缓存。
+    即使压缩没有执行（如程序异常退出），下次 load_cache 回放日志也能恢复全部数据。
     """
+    tmp_file = f"{CACHE_FILE}.{os.getpid()}.tmp"
     try:
-        with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f, indent=4, ensure_ascii=False)
-        print(f"\n缓存已成功保存到 '{CACHE_FILE}'。")
+        start = time.perf_counter()
+        with open(tmp_file, 'wb') as f:
+            f.write(_json_dumps(cache_data, indent=True))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, CACHE_FILE)
+        if os.path.exists(CACHE_JOURNAL_FILE):
+            os.remove(CACHE_JOURNAL_FILE)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"\n缓存已成功保存到 '{CACHE_FILE}' (耗时 {elapsed_ms:.1f} ms)。")
     except IOError as e:
         print(f"错误：无法将缓存写入文件 '{CACHE_FILE}': {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
 
 
 def setup_gemini():
@@ -108,13 +337,11 @@ def setup_gemini():
 
     print("Gemini 环境配置成功。")
 
-def get_app_description(client: genai.Client, app_name: str, package_name: str) -> str:
+def build_tag_prompt(app_name: str, package_name: str) -> str:
     """
-    第一步：根据应用名和包名，使用LLM生成一系列功能标签。
+    构造用于生成功能标签的提示词。
     """
-    print(f"  > [API 调用] 正在为 '{app_name}' 生成功能标签...")
-    
-    prompt = f"""
+    return f"""
 # 角色
 你是一位资深的安卓应用分析专家，精通识别各类应用的核心功能并将其“特征化”。
 
@@ -172,34 +399,76 @@ def get_app_description(client: genai.Client, app_name: str, package_name: str)
 - **应用名称**: "{app_name}"
 - **应用包名**: "{package_name}"
     """
-    
-    try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt
-        )
-        tags = response.text.strip()
-        if not tags:
-            return "信息不足"
-        return tags
-    except Exception as e:
-        print(f"    ! 调用LLM生成标签时出错: {e}")
+
+async def _describe_app(client: genai.Client, semaphore: asyncio.Semaphore, app_name: str, package_name: str) -> str:
+    """
+    第一步：根据应用名和包名，使用LLM生成一系列功能标签（异步版本）。
+    通过信号量限制在途请求数；失败时按指数退避重试，多次失败后返回"信息不足"。
+    """
+    async with semaphore:
+        print(f"  > [API 调用] 正在为 '{app_name}' 生成功能标签...")
+        prompt = build_tag_prompt(app_name, package_name)
+
+        for attempt in range(MAX_RETRIES):
+            try:
+                response = await asyncio.wait_for(
+                    client.aio.models.generate_content(
+                        model="gemini-2.0-flash",
+                        contents=prompt
+                    ),
+                    timeout=REQUEST_TIMEOUT_SECONDS
+                )
+                tags = response.text.strip()
+                if not tags:
+                    return "信息不足"
+                return tags
+            except Exception as e:
+                if attempt + 1 < MAX_RETRIES:
+                    backoff = 2 ** attempt
+                    print(f"    ! 为 '{app_name}' 生成标签失败 (第{attempt + 1}次): {e}。{backoff}秒后重试...")
+                    await asyncio.sleep(backoff)
+                else:
+                    print(f"    ! 调用LLM生成标签时出错: {e}")
         return "信息不足"
 
-def get_embedding(client: genai.Client, text: str) -> list[float] | None:
+async def _describe_apps(client: genai.Client, apps: list[App]) -> list[str]:
     """
-    第二步：将标签字符串通过Embedding模型转换为向量。
+    并发地为一批应用生成标签，返回与输入顺序一致的标签列表。
     """
-    print(f"  > 正在为标签 \"{text[:20]}...\" 生成向量...")
-    try:
-        result = client.models.embed_content(
-            model="text-embedding-004",
-            contents=text
-        )
-        return result['embedding']
-    except Exception as e:
-        print(f"    ! 调用Embedding模型时出错: {e}")
-        return None
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = [
+        _describe_app(client, semaphore, app.name, app.package)
+        for app in apps
+    ]
+    return await asyncio.gather(*tasks)
+
+def get_app_descriptions(client: genai.Client, apps: list[App]) -> list[str]:
+    """
+    并发版本的标签生成入口：对一组缓存未命中的应用批量发起API调用。
+    """
+    return asyncio.run(_describe_apps(client, apps))
+
+def get_embeddings(client: genai.Client, texts: list[str]) -> list[list[float] | None]:
+    """
+    第二步：将一组标签字符串批量提交给Embedding模型转换为向量。
+    text-embedding-004 支持在单次请求中传入多条内容，因此按 EMBED_BATCH_SIZE
+    分块提交，把N次网络往返压缩为 ⌈N/批大小⌉ 次。
+    返回与输入顺序一致的向量列表；某一块调用失败时，该块内的结果记为 None。
+    """
+    vectors: list[list[float] | None] = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        chunk = texts[start:start + EMBED_BATCH_SIZE]
+        print(f"  > 正在批量生成向量 ({start + 1}-{start + len(chunk)} / 共{len(texts)}条)...")
+        try:
+            result = client.models.embed_content(
+                model="text-embedding-004",
+                contents=chunk
+            )
+            vectors.extend(e.values for e in result.embeddings)
+        except Exception as e:
+            print(f"    ! 调用Embedding模型时出错: {e}")
+            vectors.extend([None] * len(chunk))
+    return vectors
 
 def main():
     """
@@ -222,9 +491,29 @@ def main():
     if not apps_to_process:
         print("数据库中没有找到有效的应用信息，程序终止。")
         return
+
+    # 修改点：同一个包名可能对应多条桌面记录（多屏/文件夹里的重复图标）。
+    # 按包名去重后再进入标签/向量流程，避免为重复项白白消耗API调用；
+    # 输出分组时再按包名展开回所有名称。
+    package_names = {}
+    for app in apps_to_process:
+        names = package_names.setdefault(app.package, [])
+        if app.name not in names:
+            names.append(app.name)
+    unique_apps = [App(names[0], package)
+                   for package, names in package_names.items()]
+    if len(unique_apps) < len(apps_to_process):
+        print(f"按包名去重：{len(apps_to_process)} 条桌面记录 -> {len(unique_apps)} 个应用。")
+    apps_to_process = unique_apps
     
-    # 初始化新的客户端
-    client = genai.Client()
+    # 初始化新的客户端。
+    # 显式配置带keep-alive的连接池，让同步和异步两条路径都复用底层TCP/TLS连接，
+    # 避免每次API调用重新握手（每次约100-300ms，冷启动时是主要开销之一）。
+    pool_limits = httpx.Limits(max_keepalive_connections=16, max_connections=32)
+    client = genai.Client(http_options=types.HttpOptions(
+        client_args={'limits': pool_limits},
+        async_client_args={'limits': pool_limits},
+    ))
     
     print("\n--- 开始处理应用列表 ---")
 
@@ -232,76 +521,135 @@ def main():
     app_tags_cache = load_cache()
     
     processed_apps = []
-    app_vectors = []
+    vec_mat = None
+
+    # --- 步骤 2: 检查缓存，并发地为未命中的应用生成标签 ---
+    # 标签生成是网络I/O密集型操作，逐个串行调用时总耗时随应用数线性增长；
+    # 这里先把缓存未命中的应用挑出来，一次性并发发起所有请求。
+    # 修改点：先用本地常见应用标签表兜底——缓存里没有、但表里有的包直接入缓存，
+    # 不再进入LLM调用队列。已有缓存条目（可能带向量）优先级更高，不被覆盖。
+    known_tags = load_known_tags()
+    if known_tags:
+        preloaded = 0
+        for app in apps_to_process:
+            if app.package not in app_tags_cache and app.package in known_tags:
+                app_tags_cache[app.package] = _make_cache_entry(known_tags[app.package])
+                preloaded += 1
+        if preloaded:
+            print(f"  > {preloaded} 个应用命中本地标签表，免去API调用。")
+
+    cache_misses = [app for app in apps_to_process if app.package not in app_tags_cache]
+    if cache_misses:
+        print(f"\n缓存未命中 {len(cache_misses)} 个应用，开始并发生成标签 (并发数={MAX_CONCURRENT_REQUESTS})...")
+        new_tags = get_app_descriptions(client, cache_misses)
+        for app, tags in zip(cache_misses, new_tags):
+            entry = _make_cache_entry(tags)
+            app_tags_cache[app.package] = entry
+            # 修改点：新结果逐条追加到日志文件，退出时统一压缩
+            save_cache(app.package, entry)
+    else:
+        print("\n所有应用的标签均已在缓存中。")
 
     for app in apps_to_process:
-        app_name = app['name']
-        package_name = app['package']
+        app_name = app.name
+        package_name = app.package
         print(f"\n处理应用: {app_name} ({package_name})")
 
-        tags = ""
-        # --- 步骤 2: 检查缓存或生成标签 ---
-        if package_name in app_tags_cache:
-            # 缓存命中
-            tags = app_tags_cache[package_name]
-            print(f"  > [缓存命中] 从缓存加载标签。")
-        else:
-            # 缓存未命中，调用API
-            tags = get_app_description(client, app_name, package_name)
-            # 将新结果存入缓存字典
-            app_tags_cache[package_name] = tags
-            # 修改点：每次查询到新结果后，立即写入缓存
-            save_cache(app_tags_cache)
-        
+        tags = app_tags_cache[package_name]['tags']
         print(f"  <-- 获得的标签: {tags}")
 
         if tags == "信息不足":
             print("  ! 跳过此应用，因为它信息不足。")
             continue
-        
-        app['tags'] = tags
 
-        # --- 步骤 3: 生成向量 ---
-        vector = get_embedding(client, tags)
-        if vector:
-            processed_apps.append(app)
-            app_vectors.append(vector)
-            print("  <-- 成功生成向量。")
-
-    if not app_vectors:
+        app.tags = tags
+        processed_apps.append(app)
+
+    # --- 步骤 3: 批量生成向量 ---
+    # 修改点：不再在循环内逐个调用Embedding接口，而是收齐所有标签后批量提交。
+    if processed_apps:
+        print(f"\n--- 标签阶段完成，开始生成向量 (共 {len(processed_apps)} 个应用) ---")
+
+        # 修改点：优先复用缓存中的向量。标签哈希一致说明向量未失效，
+        # 热启动时整个向量阶段可以完全不发网络请求。
+        vector_by_package = {}
+        apps_needing_embedding = []
+        for app in processed_apps:
+            entry = app_tags_cache[app.package]
+            if entry.get('embedding') and entry.get('tags_sha256') == _tags_sha256(app.tags):
+                vector_by_package[app.package] = entry['embedding']
+            else:
+                apps_needing_embedding.append(app)
+
+        print(f"  > 缓存复用 {len(vector_by_package)} 个向量，需新生成 {len(apps_needing_embedding)} 个。")
+
+        if apps_needing_embedding:
+            new_vectors = get_embeddings(client, [app.tags for app in apps_needing_embedding])
+            for app, vector in zip(apps_needing_embedding, new_vectors):
+                if vector is not None:
+                    entry = app_tags_cache[app.package]
+                    entry['embedding'] = list(vector)
+                    save_cache(app.package, entry)
+                    vector_by_package[app.package] = vector
+
+        embedded_apps = []
+        for app in processed_apps:
+            if app.package in vector_by_package:
+                embedded_apps.append(app)
+            else:
+                print(f"  ! 未能为 '{app.name}' 生成向量，已跳过。")
+        processed_apps = embedded_apps
+
+        # 修改点：把向量逐行写进预分配的float32矩阵，而不是堆一个Python列表的列表。
+        # 768维下每个应用约22KB的PyFloat对象开销降为3KB连续内存，
+        # 后续DBSCAN的距离计算也能直接走SIMD友好的连续数组路径。
+        vec_mat = np.empty((len(processed_apps), EMBEDDING_DIM), dtype=np.float32)
+        for i, app in enumerate(processed_apps):
+            vec_mat[i] = np.asarray(vector_by_package[app.package], dtype=np.float32)
+
+    if vec_mat is None or vec_mat.shape[0] == 0:
         print("\n错误：未能为任何应用生成向量，无法进行聚类。")
-        # 因为缓存已在每次获取新标签后保存，此处无需再次保存。
+        compact_cache(app_tags_cache)
         return
         
     print("\n--- 所有应用处理完毕，开始进行向量聚类 ---")
 
     # --- 步骤 4: 向量聚类 ---
-    vector_matrix = np.array(app_vectors)
-    
-    # 注意：eps参数需要根据你的数据和标签风格进行微调。
+    # 注意：COSINE_EPS需要根据你的数据和标签风格进行微调。
     # 0.3-0.6 是一个常见的起始范围。min_samples=2 表示至少2个应用才能成组。
-    print("使用DBSCAN算法进行聚类 (eps=0.4, min_samples=2, metric='cosine')...")
-    dbscan = DBSCAN(eps=0.4, min_samples=2, metric='cosine')
-    clusters = dbscan.fit_predict(vector_matrix)
+    # 先把向量归一化到单位长度：余弦相似度变成内积，余弦距离与欧氏距离
+    # 单调对应，faiss和sklearn两条聚类路径都依赖这一点。
+    norms = np.linalg.norm(vec_mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0  # 避免除零（理论上不会出现全零向量）
+    vec_mat /= norms
+
+    clusters = cluster_vectors(vec_mat, min_samples=2)
     
     print("\n--- 聚类完成！最终分类结果 ---")
     
+    # 修改点：用numpy按簇号分组——稳定排序一次，再在簇号变化的边界处切分，
+    # 把逐应用的Python级字典查找换成C级的argsort/split。
     final_groups = {}
-    for i, app_info in enumerate(processed_apps):
-        cluster_id = clusters[i]
-        
+    order = np.argsort(clusters, kind='stable')
+    sorted_clusters = clusters[order]
+    boundaries = np.flatnonzero(np.diff(sorted_clusters)) + 1
+    for slice_indices in np.split(order, boundaries):
+        cluster_id = clusters[slice_indices[0]]
+
         if cluster_id == -1:
             group_name = "独立应用/离群点"
         else:
             group_name = f"分组 {cluster_id}"
-            
-        if group_name not in final_groups:
-            final_groups[group_name] = []
-        
-        final_groups[group_name].append(app_info['name'])
+
+        group = []
+        for i in slice_indices:
+            # 展开回该包名对应的所有桌面条目名称
+            group.extend(package_names[processed_apps[i].package])
+        final_groups[group_name] = group
 
     print(json.dumps(final_groups, indent=4, ensure_ascii=False))
-    # 修改点：移除此处的最终保存调用，因为它已在循环中执行。
+    # 修改点：退出前把追加日志整合回主缓存文件
+    compact_cache(app_tags_cache)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file